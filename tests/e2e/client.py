@@ -5,6 +5,9 @@ MCP Client for E2E Testing.
 Improved stdio client that properly handles server initialization and MCP communication.
 """
 
+import atexit
+import collections
+import functools
 import json
 import subprocess
 import tempfile
@@ -13,11 +16,122 @@ import sys
 import shutil
 import time
 import threading
-import select
+import selectors
+from pathlib import Path
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# Repository root (tests/e2e/client.py -> ../..) and the test artifacts under it
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+TEST_DB_PATH = Path("/tmp/remembrances_test.db")
+TEST_LOG_PATH = PROJECT_ROOT / "remembrances-mcp-test.log"
+# Log line the server emits (to stderr and its log file) once it is ready
+SERVER_READY_MESSAGE = b"Remembrances-MCP server initialized successfully"
+# Kernel buffer requested for the server's stdout/stderr pipes
+PIPE_SIZE = 1 << 20
+# Requests call_tools keeps outstanding at once, so batches do not swamp the server
+MAX_IN_FLIGHT = 16
+# Server stderr lines kept for failure reports, and how many of them to show
+SERVER_LOG_LINES = 1000
+SERVER_LOG_TAIL = 20
+# Where `make build` puts the server binary
+SERVER_BINARY = PROJECT_ROOT / "build" / "remembrances-mcp"
+# Config files tried in order when starting the server
+CONFIG_CANDIDATES = (
+    PROJECT_ROOT / "config.test.yaml",
+    PROJECT_ROOT / "config.sample.gguf.yaml",
+)
+
+# Scratch directory shared by every client in this process (see _get_temp_dir)
+_TEMP_DIR = None
+
+# Compact stdlib encoder, built once and used when orjson is missing
+_json_encode = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+
+# JSON-RPC request envelopes; only the id, method and params are filled in
+_REQUEST_FRAME = b'{"jsonrpc":"2.0","id":%d,"method":%b,"params":%b}\n'
+_REQUEST_FRAME_NO_PARAMS = b'{"jsonrpc":"2.0","id":%d,"method":%b}\n'
+
+
+def _dumps(obj) -> bytes:
+    """Serialize a JSON value to bytes, using orjson when it is installed."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return _json_encode(obj).encode()
+
+
+def _loads(data):
+    """Parse a JSON-RPC frame, using orjson when it is installed."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+@functools.lru_cache(maxsize=None)
+def find_server_binary(*candidates: str) -> str | None:
+    """Return the first existing server binary among candidates, then SERVER_BINARY.
+
+    Every test script runs the binary built once by `make build` rather
+    than compiling its own; the lookup is cached per process.
+    """
+    for path in (*candidates, SERVER_BINARY):
+        if os.path.exists(path):
+            return str(path)
+    return None
+
+
+def _get_temp_dir() -> str:
+    """Return the per-process scratch directory, creating it on first use."""
+    global _TEMP_DIR
+    if _TEMP_DIR is None:
+        _TEMP_DIR = tempfile.mkdtemp(prefix="mcp_e2e_")
+        atexit.register(shutil.rmtree, _TEMP_DIR, ignore_errors=True)
+    return _TEMP_DIR
+
+
+def _widen_pipe(fd: int, size: int = PIPE_SIZE):
+    """Grow a pipe's kernel buffer (Linux only) so output bursts do not stall the server."""
+    if fcntl is None or not hasattr(fcntl, "F_SETPIPE_SZ"):
+        return
+    try:
+        fcntl.fcntl(fd, fcntl.F_SETPIPE_SZ, size)
+    except OSError as e:
+        # Capped by /proc/sys/fs/pipe-max-size for unprivileged users
+        print(f"⚠️  Could not widen server pipe to {size} bytes: {e}")
+
+
+def _materialize_config(src: Path, dst: str):
+    """Hard-link the config into place, copying it when linking fails."""
+    try:
+        if os.path.samefile(src, dst):
+            return
+        # Never copy onto an old link: that would write through to its source
+        os.unlink(dst)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(src, dst)
+    except OSError:
+        # EXDEV (different filesystems) or no hard-link support
+        shutil.copy2(src, dst)
 
 
 class MCPClient:
-    """Improved stdio MCP client that handles server initialization properly."""
+    """Improved stdio MCP client that handles server initialization properly.
+
+    call_tool, call_method and call_tools may be used from several threads
+    at once; responses are matched to callers by JSON-RPC id.
+    """
     
     def __init__(self, server_cmd: list[str]):
         self.server_cmd = server_cmd
@@ -25,29 +139,48 @@ class MCPClient:
         self.temp_dir = None
         self.request_id = 0
         self.log_file = None
+        # Raw stdin pipe descriptor; requests bypass the BufferedWriter
+        self._stdin_fd = None
+        # Serializes writers so frames from concurrent callers never interleave
+        self._write_lock = threading.Lock()
+        # Responses indexed by JSON-RPC id; waiters block on the condition.
+        # Only ids registered in pending_ids are kept, so late replies to
+        # requests that already timed out do not pile up.
+        self.responses: dict = {}
+        self.pending_ids: set = set()
+        self.responses_cv = threading.Condition()
+        # server_ready is set once the server reports it finished
+        # initializing; ready_event wakes start_server on that or on EOF
+        self.server_ready = False
+        self.ready_event = threading.Event()
+        self.output_thread = None
+        # Recent server stderr, printed only when something goes wrong
+        self.server_log: collections.deque = collections.deque(maxlen=SERVER_LOG_LINES)
+        # Lines received so far, and the count at the last failure dump, so
+        # requests failing together report the same tail only once
+        self._log_count = 0
+        self._log_dumped_at = None
     
     def cleanup_test_artifacts(self):
         """Clean up test database and log files before starting server."""
         # Clean up test database
-        test_db_path = "/tmp/remembrances_test.db"
-        if os.path.exists(test_db_path):
+        if TEST_DB_PATH.exists():
             try:
-                shutil.rmtree(test_db_path)
-                print(f"✅ Cleaned up test database: {test_db_path}")
+                shutil.rmtree(TEST_DB_PATH)
+                print(f"✅ Cleaned up test database: {TEST_DB_PATH}")
             except Exception as e:
                 print(f"⚠️  Failed to clean test database: {e}")
         
         # Clean up test log file
-        script_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-        log_file = os.path.join(script_dir, "remembrances-mcp-test.log")
-        if os.path.exists(log_file):
-            try:
-                os.remove(log_file)
-                print(f"✅ Cleaned up test log: {log_file}")
-            except Exception as e:
-                print(f"⚠️  Failed to clean test log: {e}")
+        try:
+            TEST_LOG_PATH.unlink()
+            print(f"✅ Cleaned up test log: {TEST_LOG_PATH}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️  Failed to clean test log: {e}")
         
-        self.log_file = log_file
+        self.log_file = TEST_LOG_PATH
     
     def start_server(self):
         """Start the MCP server process."""
@@ -57,31 +190,21 @@ class MCPClient:
         # Clean up test artifacts from previous runs
         self.cleanup_test_artifacts()
             
-        # Create temp directory first
-        self.temp_dir = tempfile.mkdtemp(prefix="mcp_e2e_")
+        # Reuse the per-process temp directory; it is removed at exit
+        self.temp_dir = _get_temp_dir()
             
         # Build the full command with config
         cmd = self.server_cmd.copy()
-        # Get the project root directory (parent of tests directory)
-        script_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-        print(f"Project dir: {script_dir}")
+        print(f"Project dir: {PROJECT_ROOT}")
         
         # Create a temporary config file to avoid conflicts with user config
         temp_config = os.path.join(self.temp_dir, "config.yaml")
-        config_file = os.path.join(script_dir, "config.test.yaml")
-        print(f"Looking for config at: {config_file}")
-        if os.path.exists(config_file):
-            shutil.copy2(config_file, temp_config)
-            print(f"Copied config from {config_file} to {temp_config}")
-        else:
-            config_file = os.path.join(script_dir, "config.sample.gguf.yaml")
-            print(f"Trying fallback config at: {config_file}")
-            if os.path.exists(config_file):
-                shutil.copy2(config_file, temp_config)
-                print(f"Copied config from {config_file} to {temp_config}")
-            else:
-                print(f"❌ No config file found")
-                return False
+        config_file = next((p for p in CONFIG_CANDIDATES if p.is_file()), None)
+        if config_file is None:
+            print(f"❌ No config file found (tried: {', '.join(map(str, CONFIG_CANDIDATES))})")
+            return False
+        _materialize_config(config_file, temp_config)
+        print(f"Using config {config_file} as {temp_config}")
         
         # Use the temporary config file
         cmd.extend(["--config", temp_config])
@@ -90,162 +213,259 @@ class MCPClient:
         #cmd.extend(["--db-path", os.path.join(self.temp_dir, "test.db")])
 
         print(f"Starting server: {' '.join(cmd)}")
+        # A client restarted after close() must wait for the new server's
+        # banner, not report the previous one as ready
+        self.ready_event.clear()
+        self.server_ready = False
+        with self.responses_cv:
+            self.responses.clear()
+            self.pending_ids.clear()
+            self.server_log.clear()
+            self._log_count = 0
+            self._log_dumped_at = None
+        # close_fds=False lets CPython spawn the server with posix_spawn()
+        # instead of fork()+exec(). It is safe because Python creates file
+        # descriptors non-inheritable (PEP 446), so the child gets only the
+        # three pipes. The fast path also needs the binary given with a
+        # directory part (e.g. ./build/remembrances-mcp), which all
+        # callers do.
         self.process = subprocess.Popen(
             cmd,
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1  # Line buffered
+            close_fds=False
         )
+        self._stdin_fd = self.process.stdin.fileno()
+        # Done after Popen rather than via pipesize=, which raises on failure
+        _widen_pipe(self.process.stdout.fileno())
+        _widen_pipe(self.process.stderr.fileno())
         
-        # Start threads to consume stdout and stderr
-        self.stdout_thread = threading.Thread(target=self._consume_stdout, daemon=True)
-        self.stderr_thread = threading.Thread(target=self._consume_stderr, daemon=True)
-        self.stdout_thread.start()
-        self.stderr_thread.start()
+        # Start a single thread that consumes both stdout and stderr
+        self.output_thread = threading.Thread(target=self._pump_output, daemon=True)
+        self.output_thread.start()
         
-        # Wait for server to be fully initialized
+        # Wait for server to be fully initialized. The stderr pump sets
+        # ready_event on the banner, and also when the pipes close, so a
+        # server that dies early wakes us up instead of running out the clock.
         print("Waiting for server initialization...")
-        start_time = time.time()
         timeout = 15  # Reduced from 60 to 15 seconds
-        
-        while time.time() - start_time < timeout:
-            if self.process.poll() is not None:
-                print("❌ Server process terminated unexpectedly")
-                return False
-            
-            # Check stderr for initialization message
-            if hasattr(self, 'server_ready') and self.server_ready:
-                print("✅ Server is ready (detected via stderr)")
-                return True
-            
-            # Also check log file for initialization message
-            if self.log_file and os.path.exists(self.log_file):
-                try:
-                    with open(self.log_file, 'r') as f:
-                        log_content = f.read()
-                        if "Remembrances-MCP server initialized successfully" in log_content:
-                            self.server_ready = True
-                            print("✅ Server is ready (detected via log file)")
-                            return True
-                except Exception as e:
-                    # Log file may not be ready yet, continue waiting
-                    pass
-            
-            time.sleep(0.5)  # Check more frequently (every 500ms instead of 1s)
-        
-        print(f"❌ Server failed to initialize within {timeout} seconds")
-        print(f"   Check log file: {self.log_file}")
-        return False
+        if not self.ready_event.wait(timeout):
+            print(f"❌ Server failed to initialize within {timeout} seconds")
+            print(f"   Check log file: {self.log_file}")
+            self.dump_server_log()
+            return False
+        if not self.server_ready:
+            print("❌ Server process terminated unexpectedly")
+            self.dump_server_log()
+            return False
+        print("✅ Server is ready (detected via stderr)")
+        return True
     
-    def _consume_stdout(self):
-        """Consume stdout and buffer JSON responses."""
-        self.response_buffer = []
+    def _pump_output(self):
+        """Read stdout and stderr from one thread and dispatch complete lines."""
+        handlers = {
+            self.process.stdout.fileno(): self._handle_stdout_line,
+            self.process.stderr.fileno(): self._handle_stderr_line,
+        }
+        buffers = {fd: bytearray() for fd in handlers}
+        selector = selectors.DefaultSelector()
+        for fd in handlers:
+            selector.register(fd, selectors.EVENT_READ)
+        open_fds = len(handlers)
         try:
-            while True:
-                line = self.process.stdout.readline()
-                if not line:
-                    break
-                line = line.strip()
-                if line and line.startswith('{'):
-                    # This looks like a JSON response
-                    try:
-                        response = json.loads(line)
-                        self.response_buffer.append(response)
-                    except json.JSONDecodeError:
-                        # Not valid JSON, skip
-                        pass
+            while open_fds:
+                for key, _ in selector.select():
+                    fd = key.fd
+                    buffer = buffers[fd]
+                    # Drain whatever the server has written in one syscall
+                    chunk = os.read(fd, 65536)
+                    if not chunk:
+                        # EOF: flush a trailing line without newline, then stop watching
+                        if buffer.strip():
+                            handlers[fd](buffer.strip())
+                        selector.unregister(fd)
+                        open_fds -= 1
+                        continue
+                    buffer.extend(chunk)
+                    end = buffer.rfind(b"\n")
+                    if end == -1:
+                        continue
+                    lines = buffer[:end].split(b"\n")
+                    del buffer[:end + 1]
+                    for line in lines:
+                        handlers[fd](line.strip())
         except:
             pass
-    
-    def _consume_stderr(self):
-        """Consume stderr and look for initialization message."""
-        self.server_ready = False
+        finally:
+            selector.close()
+            # Unblock start_server if the server exited before the banner
+            self.ready_event.set()
+            # Wake up any waiter so it notices the server has gone away
+            with self.responses_cv:
+                self.responses_cv.notify_all()
+
+    def _handle_stdout_line(self, line: bytes):
+        """Index a JSON-RPC response line by its request id."""
+        if not line.startswith(b"{"):
+            return
+        # This looks like a JSON response
         try:
-            while True:
-                line = self.process.stderr.readline()
-                if not line:
-                    break
-                line = line.strip()
-                # Look for the initialization message
-                if "Remembrances-MCP server initialized successfully" in line:
-                    self.server_ready = True
-                    print("Detected server initialization message")
-                # Also print stderr for debugging
-                if line:
-                    print(f"[SERVER] {line}", file=sys.stderr)
-        except:
-            pass
+            response = _loads(line)
+        except json.JSONDecodeError:
+            # Not valid JSON, skip
+            return
+        if not isinstance(response, dict):
+            return
+        with self.responses_cv:
+            if response.get("id") in self.pending_ids:
+                self.responses[response["id"]] = response
+                self.responses_cv.notify_all()
+
+    def _handle_stderr_line(self, line: bytes):
+        """Look for the initialization message in a server log line."""
+        if SERVER_READY_MESSAGE in line:
+            print("Detected server initialization message")
+            self.server_ready = True
+            self.ready_event.set()
+        # Keep stderr for debugging; it is only printed on failure
+        if line:
+            self.server_log.append(line)
+            self._log_count += 1
+
+    def dump_server_log(self, limit: int = SERVER_LOG_TAIL):
+        """Print the last server stderr lines to help diagnose a failure."""
+        tail = list(self.server_log)[-limit:]
+        if not tail:
+            return
+        print(f"--- last {len(tail)} server log lines ---", file=sys.stderr)
+        for line in tail:
+            print(f"[SERVER] {line.decode(errors='replace')}", file=sys.stderr)
     
+    def _dump_new_server_log(self):
+        """dump_server_log, unless nothing was logged since the last dump."""
+        if self._log_dumped_at == self._log_count:
+            return
+        self._log_dumped_at = self._log_count
+        self.dump_server_log()
+
     def call_tool(self, tool_name: str, arguments: dict) -> dict:
         """Call an MCP tool and return the result."""
-        self.request_id += 1
-        request = {
-            "jsonrpc": "2.0",
-            "id": self.request_id,
-            "method": "tools/call",
-            "params": {
-                "name": tool_name,
-                "arguments": arguments
-            }
-        }
-        
-        # Send request
-        request_json = json.dumps(request) + "\n"
+        return self.call_method("tools/call", {
+            "name": tool_name,
+            "arguments": arguments
+        })
+
+    def call_tools(self, calls: list[tuple[str, dict]], max_in_flight: int = MAX_IN_FLIGHT) -> list[dict]:
+        """Call several MCP tools concurrently over the pipe.
+
+        Requests are pipelined: up to max_in_flight of them are outstanding
+        at once, and the window is topped up as responses arrive, so the
+        server works on them concurrently instead of one round-trip at a
+        time. Results are returned in the order of calls.
+        """
+        request_ids = [self._next_request_id() for _ in calls]
+        frames = [
+            _REQUEST_FRAME % (request_id, b'"tools/call"',
+                              _dumps({"name": name, "arguments": arguments}))
+            for request_id, (name, arguments) in zip(request_ids, calls)
+        ]
+        results = []
+        sent = 0
+
         try:
-            self.process.stdin.write(request_json)
-            self.process.stdin.flush()
+            for request_id in request_ids:
+                # Top up the window of outstanding requests in a single write
+                end = min(len(results) + max_in_flight, len(frames))
+                if sent < end:
+                    self._write_frame(b"".join(frames[sent:end]))
+                    sent = end
+                results.append(self._wait_for_response(request_id))
         except BrokenPipeError:
-            return {"error": "Broken pipe - server may have terminated"}
-        
-        # Wait for response in buffer
-        start_time = time.time()
-        while time.time() - start_time < 30:  # Wait up to 30 seconds
-            if self.process.poll() is not None:
-                return {"error": "Server process terminated"}
-            
-            # Check if we have a response for our request
-            for response in self.response_buffer:
-                if isinstance(response, dict) and response.get("id") == self.request_id:
-                    self.response_buffer.remove(response)
-                    return response
-            
-            time.sleep(0.1)
-        
-        return {"error": "Timeout waiting for response"}
+            unanswered = request_ids[len(results):]
+            for request_id in unanswered:
+                self._forget_request(request_id)
+            results.extend({"error": "Broken pipe - server may have terminated"} for _ in unanswered)
+
+        return results
+
+    def wait_for(self, tool_name: str, arguments: dict, predicate, timeout: float = 5.0,
+                 interval: float = 0.05) -> tuple[bool, dict]:
+        """Poll a tool until predicate(result) is true or timeout expires.
+
+        Returns (matched, last_result) so callers can report what the
+        server last said when the condition never became true.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            result = self.call_tool(tool_name, arguments)
+            if "error" not in result and predicate(result):
+                return True, result
+            if time.monotonic() + interval > deadline:
+                return False, result
+            time.sleep(interval)
 
     def call_method(self, method: str, params: dict | None = None) -> dict:
         """Call an arbitrary MCP JSON-RPC method and return the response."""
-        self.request_id += 1
-        request: dict = {
-            "jsonrpc": "2.0",
-            "id": self.request_id,
-            "method": method,
-        }
-        if params is not None:
-            request["params"] = params
+        request_id = self._next_request_id()
+        if params is None:
+            request_json = _REQUEST_FRAME_NO_PARAMS % (request_id, _dumps(method))
+        else:
+            request_json = _REQUEST_FRAME % (request_id, _dumps(method), _dumps(params))
 
-        request_json = json.dumps(request) + "\n"
         try:
-            self.process.stdin.write(request_json)
-            self.process.stdin.flush()
+            self._write_frame(request_json)
         except BrokenPipeError:
+            self._forget_request(request_id)
             return {"error": "Broken pipe - server may have terminated"}
 
-        start_time = time.time()
-        while time.time() - start_time < 30:
-            if self.process.poll() is not None:
-                return {"error": "Server process terminated"}
+        return self._wait_for_response(request_id)
+
+    def _write_frame(self, frame: bytes):
+        """Write a request frame straight to the stdin pipe, without flush()."""
+        view = memoryview(frame)
+        with self._write_lock:
+            if self._stdin_fd is None:
+                # Not started, or closed: report it like a dead server
+                raise BrokenPipeError("server is not running")
+            while view:
+                # Frames up to PIPE_BUF go out in one write; larger ones may be short
+                written = os.write(self._stdin_fd, view)
+                view = view[written:]
 
-            for response in self.response_buffer:
-                if isinstance(response, dict) and response.get("id") == self.request_id:
-                    self.response_buffer.remove(response)
-                    return response
+    def _next_request_id(self) -> int:
+        """Allocate a request id and register it before the request is sent."""
+        with self.responses_cv:
+            self.request_id += 1
+            self.pending_ids.add(self.request_id)
+            return self.request_id
 
-            time.sleep(0.1)
+    def _forget_request(self, request_id: int):
+        """Stop waiting for request_id and drop any response stored for it."""
+        with self.responses_cv:
+            self.pending_ids.discard(request_id)
+            self.responses.pop(request_id, None)
 
-        return {"error": "Timeout waiting for response"}
+    def _wait_for_response(self, request_id: int, timeout: float = 30) -> dict:
+        """Block until the response for request_id arrives or timeout expires."""
+        deadline = time.monotonic() + timeout
+        with self.responses_cv:
+            try:
+                while request_id not in self.responses:
+                    # close() may clear self.process from another thread
+                    process = self.process
+                    if process is None or process.poll() is not None:
+                        self._dump_new_server_log()
+                        return {"error": "Server process terminated"}
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._dump_new_server_log()
+                        return {"error": "Timeout waiting for response"}
+                    # Bounded wait so a dead server is noticed even without a notify
+                    self.responses_cv.wait(min(remaining, 0.5))
+                return self.responses.pop(request_id)
+            finally:
+                self.pending_ids.discard(request_id)
     
     def close(self):
         """Close the MCP server process."""
@@ -258,7 +478,22 @@ class MCPClient:
                 self.process.kill()
                 self.process.wait()
                 print("⚠️  Server force-killed")
+            # The pump sets ready_event when it stops; let it finish before a
+            # restart clears the event, so it cannot mark the new server ready
+            if self.output_thread is not None:
+                self.output_thread.join(timeout=5)
+                self.output_thread = None
+            # Release the pipes; a stale _stdin_fd could later name another file
+            with self._write_lock:
+                self._stdin_fd = None
+            for pipe in (self.process.stdin, self.process.stdout, self.process.stderr):
+                pipe.close()
+            self.process = None
+
+    def __enter__(self):
+        """Allow `with MCPClient(...) as client:`; the server is started lazily."""
+        return self
 
-        if self.temp_dir and os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
-            print(f"✅ Cleaned up temp directory: {self.temp_dir}")
\ No newline at end of file
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -3,15 +3,68 @@
 Test Phases for E2E Testing.
 """
 
+import functools
 import os
+import re
 import shutil
-from typing import Tuple
+import sys
+from typing import Any, Tuple
 
-from .client import MCPClient
+from .client import MAX_IN_FLIGHT, MCPClient
 from .test_data import TestContext, create_test_project, get_seed_data
 from .validators import parse_toon_response, validate_toon_format
 
 
+# project_id extraction from plain-text code_index_project responses
+_PROJECT_ID_RE = re.compile(r'project_id["\s:=]+([a-zA-Z0-9_-]+)', re.IGNORECASE)
+# Message fragments that mean a graph lookup did not find the entity
+_NOT_FOUND_TOKENS = ("not found", "no entity", "found")
+# Keys that mark a get_stats / code_get_project_stats response
+_STATS_KEYS = frozenset({"KeyValueCount", "VectorCount", "EntityCount"})
+_PROJECT_STATS_KEYS = frozenset({"files_count", "files_by_language", "file_count", "files"})
+
+# Per-item progress lines, written to stdout in one go by _flush_log()
+_log_buf: list[str] = []
+
+
+def log(msg: str = ""):
+    """Queue a progress line; it is printed when the phase finishes."""
+    _log_buf.append(msg)
+
+
+def _flush_log():
+    """Write all queued progress lines with a single stdout write."""
+    if _log_buf:
+        sys.stdout.write("\n".join(_log_buf) + "\n")
+        sys.stdout.flush()
+        _log_buf.clear()
+
+
+def _shape(result: dict) -> Tuple[Any, str]:
+    """Parse a tool response and return it with its lowercased text form.
+
+    Dict responses (including JSON-RPC errors, which are returned as-is
+    without parsing) are checked by key, so their text form is left empty.
+    """
+    if "error" in result:
+        return result, ""
+    parsed = parse_toon_response(result)
+    if isinstance(parsed, dict):
+        return parsed, ""
+    return parsed, (parsed if isinstance(parsed, str) else str(parsed)).lower()
+
+
+def _buffered_log(phase):
+    """Flush the progress log when phase returns or raises."""
+    @functools.wraps(phase)
+    def wrapper(*args, **kwargs):
+        try:
+            return phase(*args, **kwargs)
+        finally:
+            _flush_log()
+    return wrapper
+
+
 def phase_1_setup(client: MCPClient) -> bool:
     """Phase 1: Setup & server launch."""
     print("\n" + "="*60)
@@ -35,6 +88,7 @@ def phase_1_setup(client: MCPClient) -> bool:
         return False
 
 
+@_buffered_log
 def phase_2_seed(client: MCPClient, context: TestContext) -> bool:
     """Phase 2: Seed baseline data."""
     print("\n" + "="*60)
@@ -44,137 +98,136 @@ def phase_2_seed(client: MCPClient, context: TestContext) -> bool:
     seed_data = get_seed_data()
     success = True
 
-    # Seed facts
-    print("\nSeeding facts...")
-    for key, value in seed_data["facts"].items():
-        try:
-            result = client.call_tool("save_fact", {
-                "key": key,
-                "value": value,
-                "user_id": "test_user"
-            })
-            if "error" in result:
-                print(f"❌ Failed to save fact {key}: {result['error']}")
-                success = False
-            else:
-                context.add_fact(key, value)
-                print(f"✅ Saved fact: {key} = {value}")
-        except Exception as e:
-            print(f"❌ Exception saving fact {key}: {e}")
+    facts = list(seed_data["facts"].items())
+    vectors = seed_data["vectors"]
+    entities = seed_data["entities"]
+    relationships = seed_data["relationships"]
+    documents = list(seed_data["documents"].items())
+    events = seed_data["events"]
+
+    # Facts, vectors, entities, documents and events do not depend on each
+    # other, so they are sent concurrently as one batch. Each category below
+    # takes its own results from the shared iterator, in the same order.
+    log(f"\nSending seed requests (up to {MAX_IN_FLIGHT} in flight)...")
+    try:
+        results = iter(client.call_tools(
+            [("save_fact", {"key": key, "value": value, "user_id": "test_user"})
+             for key, value in facts]
+            + [("add_vector", {"content": content, "user_id": "test_user"})
+               for content in vectors]
+            # Extract entity_type from properties or use a default
+            + [("create_entity", {"entity_type": props.get("type", "entity"), "name": name, "properties": dict(props)})
+               for entity_id, name, props in entities]
+            + [("kb_add_document", {"file_path": path, "content": content})
+               for path, content in documents]
+            + [("save_event", {"user_id": user_id, "subject": subject, "content": content})
+               for user_id, subject, content in events]
+        ))
+    except Exception as e:
+        log(f"❌ Exception seeding data: {e}")
+        return False
+
+    # Seed facts; successful items are recorded in the context in one go
+    log("\nSeeding facts...")
+    saved = []
+    for (key, value), result in zip(facts, results):
+        if "error" in result:
+            log(f"❌ Failed to save fact {key}: {result['error']}")
             success = False
+        else:
+            saved.append((key, value))
+            log(f"✅ Saved fact: {key} = {value}")
+    context.add_facts(saved)
 
     # Seed vectors
-    print("\nSeeding vectors...")
-    for i, content in enumerate(seed_data["vectors"]):
-        try:
-            result = client.call_tool("add_vector", {
-                "content": content,
-                "user_id": "test_user"
-            })
-            parsed = parse_toon_response(result)
-            vector_id = None
-            
-            # Try to extract vector_id from different response formats
-            if isinstance(parsed, dict):
-                vector_id = parsed.get("vector_id") or parsed.get("id")
-            elif isinstance(parsed, str):
-                # If it's just a success message, use a generated ID
-                if "success" in parsed.lower() or "added" in parsed.lower():
-                    vector_id = f"vector_{i+1}"
-            
-            if vector_id:
-                context.add_vector(content, vector_id)
-                print(f"✅ Added vector: {vector_id}")
+    log("\nSeeding vectors...")
+    for i, (content, result) in enumerate(zip(vectors, results)):
+        parsed = parse_toon_response(result)
+        vector_id = None
+        
+        # Try to extract vector_id from different response formats
+        if isinstance(parsed, dict):
+            vector_id = parsed.get("vector_id") or parsed.get("id")
+        elif isinstance(parsed, str):
+            # If it's just a success message, use a generated ID
+            if "success" in parsed.lower() or "added" in parsed.lower():
+                vector_id = f"vector_{i+1}"
+        
+        if vector_id:
+            context.add_vector(content, vector_id)
+            log(f"✅ Added vector: {vector_id}")
+        else:
+            # Still count as success if we got a success message
+            if isinstance(parsed, str) and "success" in parsed.lower():
+                context.add_vector(content, f"vector_{i+1}")
+                log(f"✅ Added vector (success confirmed)")
             else:
-                # Still count as success if we got a success message
-                if isinstance(parsed, str) and "success" in parsed.lower():
-                    context.add_vector(content, f"vector_{i+1}")
-                    print(f"✅ Added vector (success confirmed)")
-                else:
-                    print(f"⚠️  Vector added but couldn't parse ID: {result}")
-        except Exception as e:
-            print(f"❌ Exception adding vector: {e}")
-            success = False
+                log(f"⚠️  Vector added but couldn't parse ID: {result}")
 
     # Seed entities
-    print("\nSeeding entities...")
-    for entity_id, name, props in seed_data["entities"]:
-        try:
-            # Extract entity_type from properties or use a default
-            entity_type = props.get("type", "entity")
-            result = client.call_tool("create_entity", {
-                "entity_type": entity_type,
-                "name": name,
-                "properties": props
-            })
-            if "error" in result:
-                print(f"❌ Failed to create entity {entity_id}: {result['error']}")
-                success = False
-            else:
-                context.add_entity(entity_id, name)
-                print(f"✅ Created entity: {entity_id}")
-        except Exception as e:
-            print(f"❌ Exception creating entity {entity_id}: {e}")
-            success = False
-
-    # Seed relationships
-    print("\nSeeding relationships...")
-    for from_id, to_id, rel_type in seed_data["relationships"]:
-        try:
-            result = client.call_tool("create_relationship", {
-                "from_entity": from_id,
-                "to_entity": to_id,
-                "relationship_type": rel_type
-            })
-            if "error" in result:
-                print(f"❌ Failed to create relationship {from_id} -> {to_id}: {result['error']}")
-                success = False
-            else:
-                context.add_relationship(from_id, to_id, rel_type)
-                print(f"✅ Created relationship: {from_id} {rel_type} {to_id}")
-        except Exception as e:
-            print(f"❌ Exception creating relationship: {e}")
+    log("\nSeeding entities...")
+    saved = []
+    for (entity_id, name, props), result in zip(entities, results):
+        if "error" in result:
+            log(f"❌ Failed to create entity {entity_id}: {result['error']}")
             success = False
+        else:
+            saved.append((entity_id, name))
+            log(f"✅ Created entity: {entity_id}")
+    context.add_entities(saved)
 
     # Seed knowledge base documents
-    print("\nSeeding knowledge base...")
-    for path, content in seed_data["documents"].items():
-        try:
-            result = client.call_tool("kb_add_document", {
-                "file_path": path,
-                "content": content
-            })
-            if "error" in result:
-                print(f"❌ Failed to add document {path}: {result['error']}")
-                success = False
-            else:
-                context.add_document(path, content)
-                print(f"✅ Added document: {path}")
-        except Exception as e:
-            print(f"❌ Exception adding document {path}: {e}")
+    log("\nSeeding knowledge base...")
+    saved = []
+    for (path, content), result in zip(documents, results):
+        if "error" in result:
+            log(f"❌ Failed to add document {path}: {result['error']}")
             success = False
+        else:
+            saved.append((path, content))
+            log(f"✅ Added document: {path}")
+    context.add_documents(saved)
 
     # Seed events
-    print("\nSeeding events...")
-    for user_id, subject, content in seed_data["events"]:
-        try:
-            result = client.call_tool("save_event", {
-                "user_id": user_id,
-                "subject": subject,
-                "content": content
+    log("\nSeeding events...")
+    saved = []
+    for event, result in zip(events, results):
+        user_id, subject, content = event
+        if "error" in result:
+            log(f"❌ Failed to save event: {result['error']}")
+            success = False
+        else:
+            saved.append(event)
+            log(f"✅ Saved event: {subject}")
+    context.add_events(saved)
+
+    # Seed relationships, now that the entities exist
+    log("\nSeeding relationships...")
+    try:
+        results = client.call_tools([
+            ("create_relationship", {
+                "from_entity": from_id,
+                "to_entity": to_id,
+                "relationship_type": rel_type
             })
+            for from_id, to_id, rel_type in relationships
+        ])
+        saved = []
+        for relationship, result in zip(relationships, results):
+            from_id, to_id, rel_type = relationship
             if "error" in result:
-                print(f"❌ Failed to save event: {result['error']}")
+                log(f"❌ Failed to create relationship {from_id} -> {to_id}: {result['error']}")
                 success = False
             else:
-                context.add_event(user_id, subject, content)
-                print(f"✅ Saved event: {subject}")
-        except Exception as e:
-            print(f"❌ Exception saving event: {e}")
-            success = False
+                saved.append(relationship)
+                log(f"✅ Created relationship: {from_id} {rel_type} {to_id}")
+        context.add_relationships(saved)
+    except Exception as e:
+        log(f"❌ Exception creating relationships: {e}")
+        success = False
 
     # Seed code project
-    print("\nSeeding code project...")
+    log("\nSeeding code project...")
     project_dir = create_test_project()
 
     try:
@@ -183,7 +236,7 @@ def phase_2_seed(client: MCPClient, context: TestContext) -> bool:
             "project_name": "Test Project"
         })
         if "error" in result:
-            print(f"❌ Failed to index project: {result['error']}")
+            log(f"❌ Failed to index project: {result['error']}")
             success = False
         else:
             # Extract project_id from response
@@ -193,20 +246,18 @@ def phase_2_seed(client: MCPClient, context: TestContext) -> bool:
                 project_id = parsed.get("project_id") or parsed.get("ProjectID")
             elif isinstance(parsed, str) and "project_id" in parsed.lower():
                 # Try to extract from string response
-                import re
-                match = re.search(r'project_id["\s:=]+([a-zA-Z0-9_-]+)', parsed, re.IGNORECASE)
+                match = _PROJECT_ID_RE.search(parsed)
                 if match:
                     project_id = match.group(1)
             
             # Use the actual project_id or fall back to directory name
             if not project_id:
-                import os
                 project_id = os.path.basename(project_dir)
             
             context.add_project(project_id, project_dir)
-            print(f"✅ Indexed test project (ID: {project_id})")
+            log(f"✅ Indexed test project (ID: {project_id})")
     except Exception as e:
-        print(f"❌ Exception indexing project: {e}")
+        log(f"❌ Exception indexing project: {e}")
         success = False
 
     return success
@@ -227,7 +278,7 @@ def phase_3_run(client: MCPClient, context: TestContext) -> bool:
             "key": "test_preference",
             "user_id": "test_user"
         })
-        parsed = parse_toon_response(result)
+        parsed, lowered = _shape(result)
         # Handle different response formats
         value = None
         if isinstance(parsed, dict):
@@ -238,7 +289,7 @@ def phase_3_run(client: MCPClient, context: TestContext) -> bool:
                 value = context.facts.get("test_preference")
         elif isinstance(parsed, str):
             # Extract value from text like "value: dark_mode" or just "dark_mode"
-            if "value:" in parsed.lower():
+            if "value:" in lowered:
                 parts = parsed.split(":", 1)
                 if len(parts) > 1:
                     value = parts[1].strip()
@@ -302,7 +353,6 @@ def phase_3_run(client: MCPClient, context: TestContext) -> bool:
     # Test vectors
     print("\nTesting Vectors operations...")
     if context.vectors:
-        vector_id = list(context.vectors.keys())[0]
         try:
             result = client.call_tool("search_vectors", {
                 "query": "Python programming",
@@ -337,7 +387,7 @@ def phase_3_run(client: MCPClient, context: TestContext) -> bool:
         result = client.call_tool("get_entity", {
             "entity_id": "person_john"
         })
-        parsed = parse_toon_response(result)
+        parsed, lowered = _shape(result)
         # Handle different response formats
         entity_found = False
         if isinstance(parsed, dict):
@@ -348,14 +398,14 @@ def phase_3_run(client: MCPClient, context: TestContext) -> bool:
             else:
                 # Any dict response that's not a found entity is likely an error/not found
                 msg = str(parsed.get("message", "")).lower()
-                if "message" in parsed and ("not found" in msg or "no entity" in msg or "found" in msg):
+                if "message" in parsed and any(t in msg for t in _NOT_FOUND_TOKENS):
                     # Known issue: entities created with auto-generated IDs
                     print("⚠️  get_entity: entities created but IDs don't match (known API limitation)")
                     entity_found = True  # Don't fail the test
         elif isinstance(parsed, str):
             if "John" in parsed or "person_john" in parsed:
                 entity_found = True
-            elif "not found" in parsed.lower() or "no entity" in parsed.lower() or "found" in parsed.lower():
+            elif any(t in lowered for t in _NOT_FOUND_TOKENS):
                 print("⚠️  get_entity: entities created but IDs don't match (known API limitation)")
                 entity_found = True  # Don't fail the test
         
@@ -381,7 +431,7 @@ def phase_3_run(client: MCPClient, context: TestContext) -> bool:
                 has_relationships = True
             elif "message" in parsed:
                 msg = str(parsed.get("message", "")).lower()
-                if "not found" in msg or "no entity" in msg or "found" in msg:
+                if any(t in msg for t in _NOT_FOUND_TOKENS):
                     # Known issue: entities created with auto-generated IDs
                     print("⚠️  traverse_graph: using auto-generated entity IDs (known API limitation)")
                     has_relationships = True  # Don't fail the test
@@ -479,7 +529,7 @@ def phase_3_run(client: MCPClient, context: TestContext) -> bool:
     print("\nTesting Code operations...")
     try:
         result = client.call_tool("code_list_projects", {})
-        parsed = parse_toon_response(result)
+        parsed, lowered = _shape(result)
         projects = None
         if isinstance(parsed, dict):
             if "projects" in parsed:
@@ -490,7 +540,7 @@ def phase_3_run(client: MCPClient, context: TestContext) -> bool:
                 projects = []  # Don't fail the test
         elif isinstance(parsed, list):
             projects = parsed
-        elif isinstance(parsed, str) and "no" in parsed.lower() and "project" in parsed.lower():
+        elif isinstance(parsed, str) and "no" in lowered and "project" in lowered:
             # Handle "No code projects indexed" message
             print("⚠️  code_list_projects: project indexing may be async (0 projects found)")
             projects = []
@@ -505,7 +555,7 @@ def phase_3_run(client: MCPClient, context: TestContext) -> bool:
         success = False
 
     if context.projects:
-        project_id = list(context.projects.keys())[0]
+        project_id = next(iter(context.projects))
         try:
             result = client.call_tool("code_get_project_stats", {
                 "project_id": project_id
@@ -517,8 +567,12 @@ def phase_3_run(client: MCPClient, context: TestContext) -> bool:
                 return success  # Don't check further
             
             
-            parsed = parse_toon_response(result)
-            if parsed and ("file_count" in str(parsed).lower() or "files" in str(parsed).lower()):
+            parsed, lowered = _shape(result)
+            if isinstance(parsed, dict):
+                has_files = not _PROJECT_STATS_KEYS.isdisjoint(parsed)
+            else:
+                has_files = "file_count" in lowered or "files" in lowered
+            if parsed and has_files:
                 print("✅ code_get_project_stats works correctly")
             else:
                 print(f"❌ code_get_project_stats failed: {parsed}")
@@ -537,7 +591,7 @@ def phase_3_run(client: MCPClient, context: TestContext) -> bool:
         # Accept any response that contains statistics
         has_stats = False
         if isinstance(parsed, dict):
-            has_stats = any(key in parsed for key in ["KeyValueCount", "VectorCount", "EntityCount"])
+            has_stats = not _STATS_KEYS.isdisjoint(parsed)
         elif isinstance(parsed, str):
             has_stats = "KeyValueCount" in parsed or "VectorCount" in parsed
         
@@ -553,6 +607,7 @@ def phase_3_run(client: MCPClient, context: TestContext) -> bool:
     return success
 
 
+@_buffered_log
 def phase_4_teardown(client: MCPClient, context: TestContext) -> bool:
     """Phase 4: Cleanup & reporting."""
     print("\n" + "="*60)
@@ -560,52 +615,61 @@ def phase_4_teardown(client: MCPClient, context: TestContext) -> bool:
     print("="*60)
 
     # Cleanup test data
-    print("\nCleaning up test data...")
+    log("\nCleaning up test data...")
+
+    facts = list(context.facts)
+    vectors = list(context.vectors)
+    documents = list(context.documents)
+    projects = list(context.projects.items())
+
+    # All deletions are independent, so they go out as one concurrent batch
+    try:
+        results = iter(client.call_tools(
+            [("delete_fact", {"key": key, "user_id": "test_user"}) for key in facts]
+            + [("delete_vector", {"vector_id": vector_id, "user_id": "test_user"}) for vector_id in vectors]
+            + [("kb_delete_document", {"file_path": path}) for path in documents]
+            + [("code_delete_project", {"project_id": project_id}) for project_id, _ in projects]
+        ))
+    except Exception as e:
+        log(f"⚠️  Failed to delete test data: {e}")
+        results = iter(())
 
     # Delete facts
-    for key in context.facts.keys():
-        try:
-            client.call_tool("delete_fact", {
-                "key": key,
-                "user_id": "test_user"
-            })
-            print(f"✅ Deleted fact: {key}")
-        except Exception as e:
-            print(f"⚠️  Failed to delete fact {key}: {e}")
+    for key, result in zip(facts, results):
+        if "error" in result:
+            log(f"⚠️  Failed to delete fact {key}: {result['error']}")
+        else:
+            log(f"✅ Deleted fact: {key}")
 
     # Delete vectors
-    for vector_id in context.vectors.keys():
-        try:
-            client.call_tool("delete_vector", {
-                "vector_id": vector_id,
-                "user_id": "test_user"
-            })
-            print(f"✅ Deleted vector: {vector_id}")
-        except Exception as e:
-            print(f"⚠️  Failed to delete vector {vector_id}: {e}")
+    for vector_id, result in zip(vectors, results):
+        if "error" in result:
+            log(f"⚠️  Failed to delete vector {vector_id}: {result['error']}")
+        else:
+            log(f"✅ Deleted vector: {vector_id}")
 
     # Delete documents
-    for path in context.documents.keys():
-        try:
-            client.call_tool("kb_delete_document", {
-                "file_path": path
-            })
-            print(f"✅ Deleted document: {path}")
-        except Exception as e:
-            print(f"⚠️  Failed to delete document {path}: {e}")
+    for path, result in zip(documents, results):
+        if "error" in result:
+            log(f"⚠️  Failed to delete document {path}: {result['error']}")
+        else:
+            log(f"✅ Deleted document: {path}")
 
     # Delete code project
-    for project_id, path in context.projects.items():
-        try:
-            client.call_tool("code_delete_project", {
-                "project_id": project_id
-            })
-            print(f"✅ Deleted project: {project_id}")
-            if os.path.exists(path):
-                shutil.rmtree(path)
-                print(f"✅ Removed project directory: {path}")
-        except Exception as e:
-            print(f"⚠️  Failed to delete project {project_id}: {e}")
+    for (project_id, path), result in zip(projects, results):
+        if "error" in result:
+            log(f"⚠️  Failed to delete project {project_id}: {result['error']}")
+        else:
+            log(f"✅ Deleted project: {project_id}")
+
+    # Remove project directories even if the server-side delete failed
+    for project_id, path in projects:
+        if os.path.exists(path):
+            shutil.rmtree(path)
+            log(f"✅ Removed project directory: {path}")
+
+    # Emit the queued lines before close() prints its own status
+    _flush_log()
 
     # Close client connection
     client.close()
@@ -3,9 +3,13 @@
 Test Data Management for E2E Tests.
 """
 
+import atexit
+import functools
 import tempfile
 import os
-from typing import Dict, List, Any
+import shutil
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Any, Sequence, Tuple
 
 
 class TestContext:
@@ -15,52 +19,69 @@ class TestContext:
         self.facts: Dict[str, str] = {}
         self.vectors: Dict[str, str] = {}
         self.entities: Dict[str, str] = {}
-        self.relationships: List[Dict] = []
+        # Relationships and events are stored column-wise (parallel lists)
+        self.rel_from: List[str] = []
+        self.rel_to: List[str] = []
+        self.rel_type: List[str] = []
         self.documents: Dict[str, str] = {}
-        self.events: List[Dict] = []
+        self.event_user_ids: List[str] = []
+        self.event_subjects: List[str] = []
+        self.event_contents: List[str] = []
         self.projects: Dict[str, str] = {}
         self.results: Dict[str, Any] = {}
 
     def add_fact(self, key: str, value: str):
         self.facts[key] = value
 
+    def add_facts(self, items: Iterable[Tuple[str, str]]):
+        self.facts.update(items)
+
     def add_vector(self, content: str, vector_id: str):
         self.vectors[vector_id] = content
 
     def add_entity(self, entity_id: str, name: str):
         self.entities[entity_id] = name
 
+    def add_entities(self, items: Iterable[Tuple[str, str]]):
+        self.entities.update(items)
+
     def add_relationship(self, from_id: str, to_id: str, rel_type: str):
-        self.relationships.append({
-            "from": from_id,
-            "to": to_id,
-            "type": rel_type
-        })
+        self.rel_from.append(from_id)
+        self.rel_to.append(to_id)
+        self.rel_type.append(rel_type)
+
+    def add_relationships(self, rows: Sequence[Tuple[str, str, str]]):
+        if rows:
+            from_ids, to_ids, rel_types = zip(*rows)
+            self.rel_from.extend(from_ids)
+            self.rel_to.extend(to_ids)
+            self.rel_type.extend(rel_types)
 
     def add_document(self, path: str, content: str):
         self.documents[path] = content
 
+    def add_documents(self, items: Iterable[Tuple[str, str]]):
+        self.documents.update(items)
+
     def add_event(self, user_id: str, subject: str, content: str):
-        self.events.append({
-            "user_id": user_id,
-            "subject": subject,
-            "content": content
-        })
+        self.event_user_ids.append(user_id)
+        self.event_subjects.append(subject)
+        self.event_contents.append(content)
+
+    def add_events(self, rows: Sequence[Tuple[str, str, str]]):
+        if rows:
+            user_ids, subjects, contents = zip(*rows)
+            self.event_user_ids.extend(user_ids)
+            self.event_subjects.extend(subjects)
+            self.event_contents.extend(contents)
 
     def add_project(self, project_id: str, path: str):
         self.projects[project_id] = path
 
 
-def create_test_project() -> str:
-    """Create a temporary test project with sample code files."""
-    project_dir = tempfile.mkdtemp(prefix="test_project_")
-
-    # Create sample Go files
-    os.makedirs(os.path.join(project_dir, "src"))
-    os.makedirs(os.path.join(project_dir, "tests"))
-
-    files_to_create = {
-        "main.go": '''package main
+# Sample Go project written by create_test_project, as relative path -> source
+_TEST_PROJECT_SOURCES = {
+    "main.go": '''package main
 
 import "fmt"
 
@@ -72,7 +93,7 @@ func calculate(x, y int) int {
     return x + y
 }
 ''',
-        "src/utils.go": '''package utils
+    "src/utils.go": '''package utils
 
 import "strings"
 
@@ -88,7 +109,7 @@ func Reverse(s string) string {
     return string(runes)
 }
 ''',
-        "tests/utils_test.go": '''package utils
+    "tests/utils_test.go": '''package utils
 
 import "testing"
 
@@ -99,49 +120,83 @@ func TestToUpper(t *testing.T) {
     }
 }
 '''
-    }
+}
 
-    for file_path, content in files_to_create.items():
-        full_path = os.path.join(project_dir, file_path)
-        os.makedirs(os.path.dirname(full_path), exist_ok=True)
-        with open(full_path, "w") as f:
-            f.write(content)
+# Same files pre-encoded once, plus the subdirectories they need
+_TEST_PROJECT_FILES = {path: source.encode() for path, source in _TEST_PROJECT_SOURCES.items()}
+_TEST_PROJECT_DIRS = sorted({os.path.dirname(path) for path in _TEST_PROJECT_FILES} - {""})
 
+
+def _write_test_project(root: str):
+    """Write the sample Go files under root: each subdirectory once, one write per file."""
+    for dir_path in _TEST_PROJECT_DIRS:
+        os.makedirs(os.path.join(root, dir_path))
+
+    for file_path, data in _TEST_PROJECT_FILES.items():
+        fd = os.open(os.path.join(root, file_path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+
+@functools.cache
+def _template_dir() -> str:
+    """Build the sample project once per process; removed at exit."""
+    template = tempfile.mkdtemp(prefix="test_project_tpl_")
+    atexit.register(shutil.rmtree, template, ignore_errors=True)
+    _write_test_project(template)
+    return template
+
+
+def create_test_project() -> str:
+    """Create a temporary test project with sample code files."""
+    project_dir = tempfile.mkdtemp(prefix="test_project_")
+    # Copy the prebuilt template (copytree uses the kernel's fast file copy)
+    shutil.copytree(_template_dir(), project_dir, dirs_exist_ok=True)
     return project_dir
 
 
+# Predefined seed data, built once and shared read-only by every caller
+_SEED_DATA = MappingProxyType({
+    "facts": MappingProxyType({
+        "test_preference": "dark_mode",
+        "test_setting": "enabled",
+        "user_name": "test_user",
+        "app_version": "1.0.0"
+    }),
+    "vectors": (
+        "This is a test memory about Python programming",
+        "Another memory about machine learning concepts",
+        "Memory about web development best practices"
+    ),
+    "entities": (
+        ("person_john", "John Doe", MappingProxyType({"type": "person", "role": "developer"})),
+        ("person_jane", "Jane Smith", MappingProxyType({"type": "person", "role": "designer"})),
+        ("company_acme", "ACME Corp", MappingProxyType({"type": "company", "industry": "tech"}))
+    ),
+    "relationships": (
+        ("person_john", "company_acme", "works_at"),
+        ("person_jane", "company_acme", "works_at"),
+        ("person_john", "person_jane", "collaborates_with")
+    ),
+    "documents": MappingProxyType({
+        "docs/readme.md": "# Test Project\n\nThis is a test project for MCP testing.",
+        "docs/api.md": "# API Documentation\n\n## Endpoints\n\n- GET /health\n- POST /data",
+        "guides/setup.md": "# Setup Guide\n\n1. Install dependencies\n2. Run server\n3. Test connection"
+    }),
+    "events": (
+        ("test_user", "meeting", "Team standup meeting notes"),
+        ("test_user", "development", "Working on new feature implementation"),
+        ("test_user", "review", "Code review completed for PR #123")
+    )
+})
+
+
 def get_seed_data():
-    """Get predefined seed data for testing."""
-    return {
-        "facts": {
-            "test_preference": "dark_mode",
-            "test_setting": "enabled",
-            "user_name": "test_user",
-            "app_version": "1.0.0"
-        },
-        "vectors": [
-            "This is a test memory about Python programming",
-            "Another memory about machine learning concepts",
-            "Memory about web development best practices"
-        ],
-        "entities": [
-            ("person_john", "John Doe", {"type": "person", "role": "developer"}),
-            ("person_jane", "Jane Smith", {"type": "person", "role": "designer"}),
-            ("company_acme", "ACME Corp", {"type": "company", "industry": "tech"})
-        ],
-        "relationships": [
-            ("person_john", "company_acme", "works_at"),
-            ("person_jane", "company_acme", "works_at"),
-            ("person_john", "person_jane", "collaborates_with")
-        ],
-        "documents": {
-            "docs/readme.md": "# Test Project\n\nThis is a test project for MCP testing.",
-            "docs/api.md": "# API Documentation\n\n## Endpoints\n\n- GET /health\n- POST /data",
-            "guides/setup.md": "# Setup Guide\n\n1. Install dependencies\n2. Run server\n3. Test connection"
-        },
-        "events": [
-            ("test_user", "meeting", "Team standup meeting notes"),
-            ("test_user", "development", "Working on new feature implementation"),
-            ("test_user", "review", "Code review completed for PR #123")
-        ]
-    }
\ No newline at end of file
+    """Get predefined seed data for testing.
+
+    The returned mapping is shared and read-only; copy it before modifying.
+    Entity properties are mappingproxies too, so pass dict(props) to JSON.
+    """
+    return _SEED_DATA
@@ -3,7 +3,10 @@
 Validation utilities for E2E tests.
 """
 
+import functools
+import heapq
 import json
+import re
 from typing import Any, Dict, List, Optional
 
 try:
@@ -12,11 +15,47 @@ try:
 except ImportError:
     TOON_AVAILABLE = False
 
+# Prefer RapidFuzz (bit-parallel kernels, batch scans in C); python-Levenshtein
+# exposes the same Levenshtein.distance() and is used when RapidFuzz is missing;
+# without either, _myers_distance below computes distances in pure Python
 try:
-    import Levenshtein
+    from rapidfuzz import process as rapidfuzz_process
+    from rapidfuzz.distance import Levenshtein
+    RAPIDFUZZ_AVAILABLE = True
     LEVENSHTEIN_AVAILABLE = True
 except ImportError:
-    LEVENSHTEIN_AVAILABLE = False
+    RAPIDFUZZ_AVAILABLE = False
+    try:
+        import Levenshtein
+        LEVENSHTEIN_AVAILABLE = True
+    except ImportError:
+        LEVENSHTEIN_AVAILABLE = False
+
+# RapidFuzz and Levenshtein >= 0.18 accept score_cutoff (banded, early-exit
+# computation); classic python-Levenshtein does not
+SCORE_CUTOFF_SUPPORTED = False
+if LEVENSHTEIN_AVAILABLE:
+    try:
+        Levenshtein.distance("", "", score_cutoff=0)
+        SCORE_CUTOFF_SUPPORTED = True
+    except TypeError:
+        pass
+
+# process.cdist returns a NumPy matrix, so batch scans need NumPy as well
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# JSON decoder for response text; orjson accepts the str as is
+_json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
 
 
 def parse_toon_response(response: dict) -> Any:
@@ -43,6 +82,26 @@ def parse_toon_response(response: dict) -> Any:
     if not text_content.strip():
         return result if result else None
 
+    return _parse_text(text_content)
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_text(text_content: str) -> Any:
+    """Decode response text: TOON, then JSON, then key: value text, else raw.
+
+    Text that starts like JSON is tried as JSON first, so JSON responses do
+    not pay for a failing TOON decode. Results are cached by text, so the
+    same object is returned for repeated responses; callers must treat it
+    as read-only.
+    """
+    looks_like_json = text_content.lstrip()[:1] in ("{", "[")
+    if looks_like_json:
+        try:
+            return _json_loads(text_content)
+        except ValueError:
+            # TOON root arrays ("[2]: a,b") also start with "["
+            pass
+
     # Try to decode as TOON if available
     if TOON_AVAILABLE:
         try:
@@ -51,10 +110,11 @@ def parse_toon_response(response: dict) -> Any:
             pass
     
     # Try JSON
-    try:
-        return json.loads(text_content)
-    except:
-        pass
+    if not looks_like_json:
+        try:
+            return _json_loads(text_content)
+        except:
+            pass
     
     # Try to parse structured text format (key: value)
     try:
@@ -68,25 +128,24 @@ def parse_toon_response(response: dict) -> Any:
     return text_content
 
 
+# One "key: value" line; [^\S\n] is whitespace other than a newline, so
+# neither side can run into the next line, and both come out stripped
+_KV_RE = re.compile(r'^[^\S\n]*([^:\n]*?)[^\S\n]*:[^\S\n]*(.*?)[^\S\n]*$', re.M)
+_BOOL_VALUES = {"true": True, "false": False}
+# Plain optionally-negative integers only; int() alone would also take "+5", "1_0", " 5"
+_INT_RE = re.compile(r'-?\d+')
+
+
+def _coerce(value: str) -> Any:
+    """Convert a structured-text value to int or bool where it looks like one."""
+    if _INT_RE.fullmatch(value):
+        return int(value)
+    return _BOOL_VALUES.get(value.lower(), value)
+
+
 def parse_structured_text(text: str) -> Optional[Dict]:
     """Parse text with key: value format into a dict."""
-    result = {}
-    lines = text.strip().split('\n')
-    
-    for line in lines:
-        if ':' in line:
-            key, value = line.split(':', 1)
-            key = key.strip()
-            value = value.strip()
-            
-            # Try to convert value to appropriate type
-            if value.isdigit():
-                value = int(value)
-            elif value.lower() in ['true', 'false']:
-                value = value.lower() == 'true'
-            
-            result[key] = value
-    
+    result = {key: _coerce(value) for key, value in _KV_RE.findall(text)}
     return result if result else None
 
 
@@ -118,25 +177,149 @@ def validate_levenshtein_suggestions(response: dict, query: str, expected_sugges
     return any(expected in suggestion_values for expected in expected_suggestions)
 
 
-def calculate_levenshtein_distance(a: str, b: str) -> int:
-    """Calculate Levenshtein distance between two strings."""
-    if not LEVENSHTEIN_AVAILABLE:
-        return 0
-    return Levenshtein.distance(a, b)
+def _myers_distance(a: str, b: str, max_distance: Optional[int] = None) -> int:
+    """Pure-Python Levenshtein distance using Myers/Hyyrö bit-vectors.
+
+    Each column of the DP matrix is kept as two bit masks over the shorter
+    string, so a character of the longer one costs a handful of integer
+    operations instead of a row of cell updates. Python ints are unbounded,
+    so this is not limited to 64-character words.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    m, n = len(a), len(b)
+    if m == 0:
+        return n if max_distance is None else min(n, max_distance + 1)
+
+    peq: Dict[str, int] = {}
+    for i, char in enumerate(a):
+        peq[char] = peq.get(char, 0) | (1 << i)
 
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    vp, vn, score = mask, 0, m
+    for j, char in enumerate(b):
+        eq = peq.get(char, 0)
+        xv = eq | vn
+        xh = (((eq & vp) + vp) ^ vp) | eq
+        hp = vn | ~(xh | vp)
+        hn = vp & xh
+        if hp & high:
+            score += 1
+        elif hn & high:
+            score -= 1
+        hp = ((hp << 1) | 1) & mask
+        hn = (hn << 1) & mask
+        vp = (hn | ~(xv | hp)) & mask
+        vn = hp & xv
+        # Each remaining column can lower the score by at most one
+        if max_distance is not None and score - (n - j - 1) > max_distance:
+            return max_distance + 1
 
-def find_similar_strings(query: str, candidates: List[str], max_distance: int = 3) -> List[Dict]:
-    """Find strings similar to query using Levenshtein distance."""
+    return score if max_distance is None else min(score, max_distance + 1)
+
+
+@functools.lru_cache(maxsize=8192)
+def calculate_levenshtein_distance(a: str, b: str, max_distance: Optional[int] = None) -> int:
+    """Calculate Levenshtein distance between two strings.
+
+    With max_distance set, any distance above it is reported as
+    max_distance + 1, which lets the computation stop early. Results are
+    cached, since suggestion checks keep comparing the same names.
+    """
     if not LEVENSHTEIN_AVAILABLE:
-        return []
-
-    similar = []
-    for candidate in candidates:
-        distance = calculate_levenshtein_distance(query.lower(), candidate.lower())
-        if distance <= max_distance:
-            similar.append({
-                "value": candidate,
-                "distance": distance
-            })
-
-    return sorted(similar, key=lambda x: x["distance"])
\ No newline at end of file
+        return _myers_distance(a, b, max_distance)
+    if max_distance is None:
+        return Levenshtein.distance(a, b)
+    if SCORE_CUTOFF_SUPPORTED:
+        return Levenshtein.distance(a, b, score_cutoff=max_distance)
+    return min(Levenshtein.distance(a, b), max_distance + 1)
+
+
+class SimilarityIndex:
+    """Candidate strings prepared once for repeated similarity queries."""
+
+    def __init__(self, candidates: List[str]):
+        self._candidates = list(candidates)
+        # Lowercased once here instead of on every query
+        self._lowered = [candidate.lower() for candidate in self._candidates]
+
+    def query(self, query: str, max_distance: int = 3, limit: Optional[int] = None) -> List[Dict]:
+        """Find candidates within max_distance of query, closest first.
+
+        limit keeps only the closest matches, like the server's did_you_mean
+        lists; None returns all of them, as FindSimilarStrings does.
+        """
+        lowered_query = query.lower()
+
+        if RAPIDFUZZ_AVAILABLE:
+            # One C-level scan; results come back ordered by distance.
+            # processor=None: rapidfuzz < 3 defaults extract() to
+            # default_process, which strips punctuation and skews distances
+            matches = rapidfuzz_process.extract(
+                lowered_query,
+                self._lowered,
+                scorer=Levenshtein.distance,
+                processor=None,
+                score_cutoff=max_distance,
+                limit=limit,
+            )
+            return [{"value": self._candidates[index], "distance": distance} for _, distance, index in matches]
+
+        similar = []
+        for candidate, lowered in zip(self._candidates, self._lowered):
+            # Strings whose lengths differ by more than max_distance cannot match
+            if abs(len(lowered_query) - len(lowered)) > max_distance:
+                continue
+            distance = calculate_levenshtein_distance(lowered_query, lowered, max_distance)
+            if distance <= max_distance:
+                similar.append({
+                    "value": candidate,
+                    "distance": distance
+                })
+
+        if limit is not None:
+            # O(n log k) partial selection; stable like sorted()[:limit]
+            return heapq.nsmallest(limit, similar, key=lambda x: x["distance"])
+        return sorted(similar, key=lambda x: x["distance"])
+
+    def query_many(self, queries: List[str], max_distance: int = 3,
+                   limit: Optional[int] = None) -> List[List[Dict]]:
+        """Run query() for each of queries; results are in the same order."""
+        if not (RAPIDFUZZ_AVAILABLE and NUMPY_AVAILABLE and queries and self._candidates):
+            return [self.query(query, max_distance, limit) for query in queries]
+
+        # Whole queries x candidates distance matrix in one multi-threaded C call;
+        # entries above score_cutoff come back as max_distance + 1
+        matrix = rapidfuzz_process.cdist(
+            [query.lower() for query in queries],
+            self._lowered,
+            scorer=Levenshtein.distance,
+            processor=None,
+            score_cutoff=max_distance,
+            dtype=np.int32,
+            workers=-1,
+        )
+        results = []
+        for row in matrix:
+            hits = np.flatnonzero(row <= max_distance)
+            # Stable sort keeps candidate order among equal distances, like query()
+            hits = hits[np.argsort(row[hits], kind="stable")][:limit]
+            results.append([{"value": self._candidates[index], "distance": int(row[index])} for index in hits])
+        return results
+
+
+def find_similar_strings(query: str, candidates: List[str], max_distance: int = 3,
+                         limit: Optional[int] = None) -> List[Dict]:
+    """Find strings similar to query using Levenshtein distance.
+
+    For several queries against the same candidates, build a
+    SimilarityIndex once and call its query() method instead.
+    """
+    return SimilarityIndex(candidates).query(query, max_distance, limit)
+
+
+def batch_find_similar(queries: List[str], candidates: List[str], max_distance: int = 3,
+                       limit: Optional[int] = None) -> List[List[Dict]]:
+    """find_similar_strings for several queries at once, one result list per query."""
+    return SimilarityIndex(candidates).query_many(queries, max_distance, limit)
@@ -15,60 +15,21 @@ Usage:
     python tests/test_code_monitoring.py
 """
 
-import json
-import subprocess
+import shutil
 import tempfile
-import time
 import os
 import sys
+from pathlib import Path
 
+# Add the e2e module to path
+sys.path.insert(0, os.path.dirname(__file__))
 
-class MCPClient:
-    """Simple MCP client for testing via stdio."""
-    
-    def __init__(self, server_cmd: list[str]):
-        self.process = subprocess.Popen(
-            server_cmd,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        self.request_id = 0
-    
-    def call_tool(self, tool_name: str, arguments: dict) -> dict:
-        """Call an MCP tool and return the result."""
-        self.request_id += 1
-        request = {
-            "jsonrpc": "2.0",
-            "id": self.request_id,
-            "method": "tools/call",
-            "params": {
-                "name": tool_name,
-                "arguments": arguments
-            }
-        }
-        
-        self.process.stdin.write(json.dumps(request) + "\n")
-        self.process.stdin.flush()
-        
-        response_line = self.process.stdout.readline()
-        return json.loads(response_line)
-    
-    def close(self):
-        """Close the MCP server process."""
-        self.process.terminate()
-        self.process.wait()
+from e2e.client import MCPClient, find_server_binary
+from e2e.validators import parse_toon_response
 
 
-def create_test_project() -> str:
-    """Create a temporary test project with sample code files."""
-    test_dir = tempfile.mkdtemp(prefix="code_monitor_test_")
-    
-    # Create sample Go file
-    go_file = os.path.join(test_dir, "main.go")
-    with open(go_file, "w") as f:
-        f.write('''package main
+_TEST_PROJECT_FILES = {
+    "main.go": b'''package main
 
 import "fmt"
 
@@ -79,12 +40,8 @@ func main() {
 func greet(name string) string {
     return "Hello, " + name
 }
-''')
-    
-    # Create sample Python file
-    py_file = os.path.join(test_dir, "utils.py")
-    with open(py_file, "w") as f:
-        f.write('''"""Utility functions for testing."""
+''',
+    "utils.py": b'''"""Utility functions for testing."""
 
 def calculate_sum(a: int, b: int) -> int:
     """Add two numbers."""
@@ -100,14 +57,8 @@ class Calculator:
         result = a + b
         self.history.append(("add", a, b, result))
         return result
-''')
-    
-    # Create subdirectory with TypeScript file
-    subdir = os.path.join(test_dir, "src")
-    os.makedirs(subdir)
-    ts_file = os.path.join(subdir, "service.ts")
-    with open(ts_file, "w") as f:
-        f.write('''export interface User {
+''',
+    "src/service.ts": b'''export interface User {
     id: number;
     name: string;
 }
@@ -123,9 +74,30 @@ export class UserService {
         return this.users.find(u => u.id === id);
     }
 }
-''')
+''',
+}
+
+
+def _find_project(result: dict, root_path: str) -> dict | None:
+    """Return the code_list_projects entry for root_path, if listed."""
+    # The server answers with TOON: {projects: [...], count: N}
+    parsed = parse_toon_response(result)
+    projects = parsed.get("projects") if isinstance(parsed, dict) else parsed
+    if not isinstance(projects, list):
+        return None
+    return next((p for p in projects if isinstance(p, dict) and p.get("root_path") == root_path), None)
+
+
+def create_test_project() -> str:
+    """Create a temporary test project with sample code files."""
+    test_dir = Path(tempfile.mkdtemp(prefix="code_monitor_test_"))
+    
+    for rel_path, data in _TEST_PROJECT_FILES.items():
+        file_path = test_dir / rel_path
+        file_path.parent.mkdir(exist_ok=True)
+        file_path.write_bytes(data)
     
-    return test_dir
+    return str(test_dir)
 
 
 def test_activate_project_watch(client: MCPClient, project_id: str) -> bool:
@@ -216,9 +188,22 @@ def test_file_modification_triggers_reindex(client: MCPClient, project_path: str
     with open(go_file, "a") as f:
         f.write("\nfunc newFunction() { /* added by test */ }\n")
     
-    # Wait for debounce + processing
-    print("Waiting for file change detection (5 seconds)...")
-    time.sleep(5)
+    # Poll until the new symbol is indexed instead of sleeping out the debounce
+    print("Waiting for file change detection (up to 5 seconds)...")
+    def symbol_indexed(result: dict) -> bool:
+        # Both replies echo the pattern, so only a parsed symbols list counts
+        parsed = parse_toon_response(result)
+        symbols = parsed.get("symbols") if isinstance(parsed, dict) else None
+        return isinstance(symbols, list) and any(
+            isinstance(symbol, dict) and symbol.get("name") == "newFunction" for symbol in symbols
+        )
+    
+    reindexed, _ = client.wait_for("code_find_symbol", {
+        "project_id": project_id,
+        "name_path_pattern": "newFunction"
+    }, symbol_indexed, timeout=5.0)
+    if not reindexed:
+        print("WARN: newFunction not indexed within 5 seconds")
     
     # Check status to see if reindex happened
     result = client.call_tool("code_get_watch_status", {
@@ -245,10 +230,8 @@ def run_tests():
     print("=" * 60)
     
     # Check if server binary exists
-    server_path = "./build/remembrances-mcp"
-    if not os.path.exists(server_path):
-        server_path = "./remembrances-mcp"
-    if not os.path.exists(server_path):
+    server_path = find_server_binary("./build/remembrances-mcp", "./remembrances-mcp")
+    if server_path is None:
         print("ERROR: Server binary not found. Build with 'make build' first.")
         sys.exit(1)
     
@@ -262,6 +245,10 @@ def run_tests():
     client = MCPClient([server_path])
     
     try:
+        if not client.start_server():
+            print("ERROR: Server failed to start")
+            return
+        
         # First, index the test project
         print("\n=== Setup: Index Test Project ===")
         result = client.call_tool("code_index_project", {
@@ -278,26 +265,23 @@ def run_tests():
         if content:
             print(f"Indexing started: {content[0].get('text', '')}")
         
-        # Wait for indexing to complete
-        print("Waiting for indexing to complete (10 seconds)...")
-        time.sleep(10)
+        # The project is listed as in_progress before any file is scanned,
+        # so wait for its indexing_status rather than for it to appear
+        print("Waiting for indexing to complete (up to 10 seconds)...")
+        def project_indexed(result: dict) -> bool:
+            project = _find_project(result, test_project_path)
+            return project is not None and project.get("indexing_status") == "completed"
         
-        # Get project ID from list
-        result = client.call_tool("code_list_projects", {})
-        projects = []
-        if not "error" in result:
-            content = result.get("result", {}).get("content", [])
-            if content:
-                try:
-                    projects = json.loads(content[0].get("text", "[]"))
-                except json.JSONDecodeError:
-                    pass
-        
-        if not projects:
+        indexed, result = client.wait_for("code_list_projects", {}, project_indexed, timeout=10.0)
+        project = _find_project(result, test_project_path)
+        if project is None:
             print("ERROR: No projects found after indexing")
             return
+        if not indexed:
+            print(f"ERROR: Indexing did not complete (status: {project.get('indexing_status')})")
+            return
         
-        project_id = projects[-1].get("id") or projects[-1].get("project_id")
+        project_id = project.get("project_id") or project.get("id")
         print(f"Test project ID: {project_id}")
         
         # Run tests
@@ -339,7 +323,6 @@ def run_tests():
         
         # Cleanup
         print(f"\nCleaning up test project: {test_project_path}")
-        import shutil
         shutil.rmtree(test_project_path, ignore_errors=True)
 
 
@@ -13,18 +13,27 @@ Usage:
 """
 
 import argparse
-import json
+import functools
 import os
 import sys
 import time
 import tempfile
 import shutil
+import socket
 import subprocess
 
 # Add the e2e module to path
 sys.path.insert(0, os.path.dirname(__file__))
 
-from e2e.client import MCPClient
+from e2e.client import SERVER_BINARY, MCPClient, find_server_binary
+
+SECONDARY_DB_ADDR = ("127.0.0.1", 8001)
+
+
+def _response_text(result: dict) -> str:
+    """Return the first text block of a tools/call response."""
+    content = result.get("result", result).get("content", [])
+    return content[0].get("text", "") if isinstance(content, list) and content else ""
 
 
 class DbSyncTestContext:
@@ -50,6 +59,31 @@ class DbSyncTestContext:
             shutil.rmtree(self.temp_dir, ignore_errors=True)
 
 
+@functools.lru_cache(maxsize=None)
+def _which(name: str) -> str | None:
+    """shutil.which, cached so repeated setups do not rescan PATH."""
+    return shutil.which(name)
+
+
+def _wait_for_port(proc: subprocess.Popen, addr: tuple, timeout: float = 5.0, interval: float = 0.05,
+                   grace: float = 0.5) -> bool:
+    """Poll until addr accepts TCP connections, proc exits, or timeout expires."""
+    deadline = time.monotonic() + timeout
+    while proc.poll() is None:
+        try:
+            with socket.create_connection(addr, timeout=0.1):
+                pass
+            # Any process may be listening on addr; if it is not proc, proc
+            # fails to bind and exits, so give it a moment to do that
+            time.sleep(grace)
+            return proc.poll() is None
+        except OSError:
+            if time.monotonic() + interval > deadline:
+                return False
+            time.sleep(interval)
+    return False
+
+
 def setup_secondary_database(context: DbSyncTestContext) -> bool:
     """
     Set up a secondary SurrealDB instance for testing.
@@ -60,33 +94,38 @@ def setup_secondary_database(context: DbSyncTestContext) -> bool:
     # Create temp directory for secondary DB
     context.temp_dir = tempfile.mkdtemp(prefix="dbsync_test_")
     secondary_db_path = os.path.join(context.temp_dir, "secondary.db")
+    secondary_log_path = os.path.join(context.temp_dir, "secondary.err")
     
     # Check if surreal CLI is available
-    if shutil.which("surreal") is None:
+    if _which("surreal") is None:
         print("⚠️  SurrealDB CLI not found, skipping secondary DB setup")
         print("   Install with: curl -sSf https://install.surrealdb.com | sh")
         return False
     
     # Start secondary SurrealDB on different port
     try:
-        context.secondary_db_proc = subprocess.Popen(
-            [
-                "surreal", "start",
-                "--log", "error",
-                "--bind", "127.0.0.1:8001",
-                "--user", "root",
-                "--pass", "root",
-                "file://" + secondary_db_path
-            ],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.PIPE
-        )
-        
-        # Wait for secondary to start
-        time.sleep(2)
-        
-        if context.secondary_db_proc.poll() is not None:
+        # stderr goes to a file so a chatty server can never fill an unread pipe;
+        # the child keeps its own descriptor once Popen returns
+        with open(secondary_log_path, "wb") as stderr_file:
+            context.secondary_db_proc = subprocess.Popen(
+                [
+                    "surreal", "start",
+                    "--log", "error",
+                    "--bind", "127.0.0.1:8001",
+                    "--user", "root",
+                    "--pass", "root",
+                    "file://" + secondary_db_path
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=stderr_file
+            )
+        
+        # Wait until the secondary accepts connections
+        if not _wait_for_port(context.secondary_db_proc, SECONDARY_DB_ADDR):
             print("❌ Secondary SurrealDB failed to start")
+            with open(secondary_log_path, "rb") as f:
+                for line in f.read().decode(errors="replace").splitlines()[-20:]:
+                    print(f"   [surreal] {line}")
             return False
         
         print(f"✅ Secondary SurrealDB started on port 8001")
@@ -191,27 +230,23 @@ def test_write_operations_sync(client: MCPClient, context: DbSyncTestContext) ->
         context.test_facts[test_key] = test_value
         print(f"✅ Fact saved: {test_key}")
         
-        # Wait for sync to complete
-        print("   Waiting for sync (2 seconds)...")
-        time.sleep(2)
-        
-        # Verify fact can be retrieved
-        result = client.call_tool("get_fact", {
+        # Poll until the fact is readable rather than sleeping a fixed time
+        print("   Waiting for sync (up to 2 seconds)...")
+        _, result = client.wait_for("get_fact", {
             "user_id": context.user_id,
             "key": test_key
-        })
+        }, lambda r: test_value in _response_text(r), timeout=2.0)
         
         if "error" in result:
             print(f"❌ Failed to retrieve fact: {result['error']}")
             return False
         
         # Parse the response
-        content = result.get("content", [])
-        if not content:
+        response_text = _response_text(result)
+        if not response_text:
             print("❌ No content in response")
             return False
         
-        response_text = content[0].get("text", "") if isinstance(content, list) else ""
         if test_value not in response_text:
             print(f"❌ Retrieved value mismatch: {response_text}")
             return False
@@ -243,15 +278,12 @@ def test_vector_sync(client: MCPClient, context: DbSyncTestContext) -> bool:
         
         print(f"✅ Vector added")
         
-        # Wait for sync
-        time.sleep(2)
-        
-        # Search for the vector
-        result = client.call_tool("search_vectors", {
+        # Search for the vector, polling until it shows up
+        _, result = client.wait_for("search_vectors", {
             "user_id": context.user_id,
             "query": "test vector db-sync",
             "limit": 5
-        })
+        }, lambda r: test_content in _response_text(r), timeout=2.0)
         
         if "error" in result:
             print(f"❌ Failed to search vectors: {result['error']}")
@@ -277,13 +309,17 @@ def test_merged_query_results(client: MCPClient, context: DbSyncTestContext) ->
             "merge_test_3": "value_3"
         }
         
-        for key, value in facts_to_save.items():
-            result = client.call_tool("save_fact", {
+        # Independent writes: send them as one pipelined batch
+        results = client.call_tools([
+            ("save_fact", {
                 "user_id": context.user_id,
                 "key": key,
                 "value": value
             })
-            
+            for key, value in facts_to_save.items()
+        ])
+        
+        for (key, value), result in zip(facts_to_save.items(), results):
             if "error" in result:
                 print(f"❌ Failed to save fact {key}: {result['error']}")
                 return False
@@ -292,21 +328,17 @@ def test_merged_query_results(client: MCPClient, context: DbSyncTestContext) ->
         
         print(f"✅ Saved {len(facts_to_save)} facts")
         
-        # Wait for sync
-        time.sleep(2)
-        
-        # List all facts for user
-        result = client.call_tool("list_facts", {
+        # List all facts for user, polling until every key is visible
+        _, result = client.wait_for("list_facts", {
             "user_id": context.user_id
-        })
+        }, lambda r: all(key in _response_text(r) for key in facts_to_save), timeout=2.0)
         
         if "error" in result:
             print(f"❌ Failed to list facts: {result['error']}")
             return False
         
         # Verify we can see the saved facts in the list
-        content = result.get("content", [])
-        response_text = content[0].get("text", "") if isinstance(content, list) and len(content) > 0 else ""
+        response_text = _response_text(result)
         
         found_count = sum(1 for key in facts_to_save.keys() if key in response_text)
         
@@ -392,15 +424,12 @@ def main():
     args = parser.parse_args()
     
     # Check server binary exists
-    if not os.path.exists(args.server):
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        server_path = os.path.join(script_dir, "..", "build", "remembrances-mcp")
-        if os.path.exists(server_path):
-            args.server = server_path
-        else:
-            print(f"❌ Server binary not found at {args.server} or {server_path}")
-            print("   Build with: make build")
-            sys.exit(1)
+    found = find_server_binary(args.server)
+    if found is None:
+        print(f"❌ Server binary not found at {args.server} or {SERVER_BINARY}")
+        print("   Build with: make build")
+        sys.exit(1)
+    args.server = found
     
     print("="*70)
     print("DB-SYNC-SERVER MODULE E2E TESTS")
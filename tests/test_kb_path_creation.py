@@ -14,7 +14,7 @@ import tempfile
 # Add the e2e module to path
 sys.path.insert(0, os.path.dirname(__file__))
 
-from e2e.client import MCPClient
+from e2e.client import SERVER_BINARY, MCPClient, find_server_binary
 
 
 KB_TOOL_NAMES = {
@@ -35,18 +35,15 @@ def _tool_names(resp: dict) -> set[str]:
 
 
 def main() -> int:
-    server_bin = os.path.join(os.path.dirname(__file__), "..", "build", "remembrances-mcp")
-    server_bin = os.path.abspath(server_bin)
-
-    if not os.path.exists(server_bin):
-        print(f"ERROR: Server binary not found at {server_bin}")
+    server_bin = find_server_binary()
+    if server_bin is None:
+        print(f"ERROR: Server binary not found at {SERVER_BINARY}")
         return 1
 
     # Case 1: missing path -> should be created and KB tools available.
     tmp_root = tempfile.mkdtemp(prefix="kb_test_")
     kb_path = os.path.join(tmp_root, "nested", "kb")
-    client = MCPClient([server_bin, "--knowledge-base", kb_path])
-    try:
+    with MCPClient([server_bin, "--knowledge-base", kb_path]) as client:
         if not client.start_server():
             print("ERROR: server failed to start (mkdir success case)")
             return 1
@@ -65,13 +62,10 @@ def main() -> int:
             print("ERROR: expected KB tools to be present when KB dir is usable")
             print(f"Tools: {sorted(names)}")
             return 1
-    finally:
-        client.close()
 
     # Case 2: uncreatable path -> server starts, KB tools absent.
     bad_kb_path = "/proc/remembrances-kb-test/nested"
-    client2 = MCPClient([server_bin, "--knowledge-base", bad_kb_path])
-    try:
+    with MCPClient([server_bin, "--knowledge-base", bad_kb_path]) as client2:
         if not client2.start_server():
             print("ERROR: server failed to start (mkdir failure case)")
             return 1
@@ -89,8 +83,6 @@ def main() -> int:
 
         print("✅ knowledge base path creation/disable behavior is correct")
         return 0
-    finally:
-        client2.close()
 
 
 if __name__ == "__main__":
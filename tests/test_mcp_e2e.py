@@ -24,7 +24,7 @@ import sys
 # Add the e2e module to path
 sys.path.insert(0, os.path.dirname(__file__))
 
-from e2e.client import MCPClient
+from e2e.client import SERVER_BINARY, MCPClient, find_server_binary
 from e2e.test_data import TestContext
 from e2e.phases import phase_1_setup, phase_2_seed, phase_3_run, phase_4_teardown
 
@@ -40,16 +40,12 @@ def main():
 
     args = parser.parse_args()
 
-    # Check server binary
-    if not os.path.exists(args.server):
-        # Try relative to script directory
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        server_path = os.path.join(script_dir, "..", "build", "remembrances-mcp")
-        if os.path.exists(server_path):
-            args.server = server_path
-        else:
-            print(f"ERROR: Server binary not found at {args.server} or {server_path}")
-            sys.exit(1)
+    # Check server binary, falling back to the build directory
+    server_path = find_server_binary(args.server)
+    if server_path is None:
+        print(f"ERROR: Server binary not found at {args.server} or {SERVER_BINARY}")
+        sys.exit(1)
+    args.server = server_path
 
     print(f"Using server binary: {args.server}")
 
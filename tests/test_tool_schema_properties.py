@@ -16,19 +16,16 @@ import sys
 # Add the e2e module to path
 sys.path.insert(0, os.path.dirname(__file__))
 
-from e2e.client import MCPClient
+from e2e.client import SERVER_BINARY, MCPClient, find_server_binary
 
 
 def main() -> int:
-    server_bin = os.path.join(os.path.dirname(__file__), "..", "build", "remembrances-mcp")
-    server_bin = os.path.abspath(server_bin)
-
-    if not os.path.exists(server_bin):
-        print(f"ERROR: Server binary not found at {server_bin}")
+    server_bin = find_server_binary()
+    if server_bin is None:
+        print(f"ERROR: Server binary not found at {SERVER_BINARY}")
         return 1
 
-    client = MCPClient([server_bin])
-    try:
+    with MCPClient([server_bin]) as client:
         if not client.start_server():
             print("ERROR: server failed to start")
             return 1
@@ -80,8 +77,6 @@ def main() -> int:
 
         print("✅ tool schema includes properties for code_list_projects")
         return 0
-    finally:
-        client.close()
 
 
 if __name__ == "__main__":